@@ -0,0 +1,109 @@
+# coding: utf-8
+"""
+Standalone django setup for eavkit benchmarks: in-memory sqlite database,
+Product model with eav data and AttributeOptions model, registered in
+eavkit. Run benchmarks from repository root: python benchmarks/<name>.py
+"""
+import os
+import sys
+import gc
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+from django.conf import settings
+
+settings.configure(
+    SECRET_KEY='benchmark',
+    SITE_ID=1,
+    INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.sites',
+                    'eavkit'],
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3',
+                           'NAME': ':memory:'}},
+)
+django.setup()
+
+from django.db import connection, models
+from django.contrib.sites.models import Site
+from eavkit.models import BaseAttributeOptions
+from eavkit.registry import registry
+
+
+class Product(models.Model):
+    name = models.CharField(max_length=200)
+    eavdata = models.TextField(blank=True)
+
+    class Meta:
+        app_label = 'eavkit'
+
+
+class AttributeOptions(BaseAttributeOptions):
+    class Meta(BaseAttributeOptions.Meta):
+        app_label = 'eavkit'
+        abstract = False
+
+
+registry.register_model(AttributeOptions)
+registry.register_builtin_attributes()
+registry.register(Product)
+
+# attribute options of a typical catalog: slug, datatype, choices, multiple
+ATTRIBUTES = (
+    [('brand', 'string', 50, False), ('color', 'string', 12, True),
+     ('size', 'string', 8, False), ('material', 'string', 20, False),
+     ('country', 'string', 30, False), ('description', 'text', 0, False),
+     ('care', 'text', 0, False), ('weight', 'float', 0, False),
+     ('width', 'integer', 0, False), ('height', 'integer', 0, False),
+     ('depth', 'integer', 0, False), ('warranty', 'integer', 6, False),
+     ('waterproof', 'bool', 0, False), ('eco', 'bool', 0, False),
+     ('released', 'date', 0, False), ('updated', 'datetime', 0, False)] +
+    [('extra_%d' % i, 'string', 0, False) for i in range(4)]
+)
+
+
+def setup_database():
+    with connection.schema_editor() as editor:
+        for model in (Site, AttributeOptions, Product):
+            editor.create_model(model)
+    Site.objects.create(pk=1, domain='example.com', name='example')
+    for weight, (slug, datatype, choices, multiple) in enumerate(ATTRIBUTES):
+        AttributeOptions.objects.create(
+            name=slug, slug=slug, datatype=datatype, multiple=multiple,
+            weight=weight, choices=u'\n'.join(
+                (u'%d = %s %d' if datatype == 'integer' else
+                 u'{0}_%d = %s %d'.format(slug)) % (i, slug.title(), i)
+                for i in range(choices)))
+
+
+def get_rss():
+    """Current resident set size in bytes (linux) or peak one (other)."""
+    gc.collect()
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def mib(value):
+    return value / 1024.0 / 1024.0
+
+
+def product_values(rnd=random):
+    """Raw eav values (json-ready) of a random product."""
+    return {
+        'brand': 'brand_%d' % rnd.randint(0, 49),
+        'color': ['color_%d' % rnd.randint(0, 11) for i in range(2)],
+        'size': 'size_%d' % rnd.randint(0, 7),
+        'material': 'material_%d' % rnd.randint(0, 19),
+        'country': 'country_%d' % rnd.randint(0, 29),
+        'weight': round(rnd.uniform(0.1, 20), 2),
+        'width': rnd.randint(1, 200), 'height': rnd.randint(1, 200),
+        'depth': rnd.randint(1, 200), 'warranty': rnd.randint(0, 5),
+        'waterproof': rnd.random() > 0.5, 'eco': rnd.random() > 0.7,
+        'released': '2017-%02d-%02d' % (rnd.randint(1, 12),
+                                        rnd.randint(1, 28)),
+        'updated': '2017-09-19T14:41:00',
+    }
@@ -0,0 +1,115 @@
+# coding: utf-8
+"""
+Size and CPU cost of eav data compression on a catalog with long product
+descriptions (english prose of python standard library docstrings).
+
+Saves N products with each compression setup and measures total eav data
+size, encoding time (Entity.dump), full decoding time (Entity.storage),
+partial decoding of one short attribute (Entity.get_value) and reading of
+compressed description. Usage: python benchmarks/compression.py [N]
+"""
+import sys
+import json
+import time
+import random
+import importlib
+from django.conf import settings
+from django.utils import six
+from django.utils.encoding import force_text
+from common import Product, setup_database, product_values
+
+CORPUS_MODULES = ('collections', 'json', 'os', 're', 'textwrap', 'logging',
+                  'decimal', 'datetime', 'threading', 'argparse', 'inspect',
+                  'unittest', 'email', 'subprocess', 'pickle', 'socket')
+
+
+def get_corpus():
+    texts = []
+    for name in CORPUS_MODULES:
+        module = importlib.import_module(name)
+        for item in [module] + list(vars(module).values()):
+            doc = getattr(item, '__doc__', None)
+            if isinstance(doc, six.string_types) and len(doc) > 200:
+                texts.append(u' '.join(
+                    force_text(doc, errors='ignore').split()))
+    return u' '.join(sorted(set(texts)))
+
+
+def get_text(corpus, rnd, min_length, max_length):
+    start = rnd.randint(0, len(corpus) - max_length)
+    return corpus[start:start + rnd.randint(min_length, max_length)]
+
+
+def get_raw_values(count):
+    rnd, corpus = random.Random(0), get_corpus()
+    values = []
+    for i in range(count):
+        raw = product_values(rnd)
+        raw['description'] = get_text(corpus, rnd, 300, 3000)
+        raw['care'] = get_text(corpus, rnd, 80, 300)
+        values.append(raw)
+    return values
+
+
+def measure(raw_values, text_threshold, blob_threshold):
+    settings.EAVKIT_TEXT_COMPRESS_THRESHOLD = text_threshold
+    Product._eav_config.compress_threshold = blob_threshold
+
+    products = []
+    for index, raw in enumerate(raw_values):
+        product = Product(pk=index + 1)
+        product.eav.__storage__ = product.eav.deserialize(json.dumps(raw))
+        product.eav.attributes
+        products.append(product)
+    start = time.time()
+    blobs = [product.eav.dump() for product in products]
+    encode = time.time() - start
+
+    def timeit(function):
+        products = [Product(pk=index + 1, eavdata=blob)
+                    for index, blob in enumerate(blobs)]
+        for product in products:
+            product.eav.attributes  # exclude schema resolving
+        start = time.time()
+        for product in products:
+            function(product.eav)
+        return (time.time() - start) / len(products) * 1e6
+
+    return (sum(len(blob) for blob in blobs), encode / len(blobs) * 1e6,
+            timeit(lambda entity: entity.storage),
+            timeit(lambda entity: entity.get_value('brand')),
+            timeit(lambda entity: entity.description),)
+
+
+def main(count):
+    setup_database()
+    raw_values = get_raw_values(count)
+    setups = (('text >= 1024', 1024, None,),
+              ('text >= 256', 256, None,),
+              ('blob >= 1024', None, 1024,),
+              ('text >= 1024, blob', 1024, 1024,),)
+    codecs = ['zlib']
+    try:
+        importlib.import_module('zstandard')
+        codecs.append('zstd')
+    except ImportError:
+        pass
+
+    line = '%-26s %10s %7s %7s %7s %7s %7s'
+    print('%d products, times in us per product' % count)
+    print(line % ('setup', 'bytes', 'ratio', 'dump', 'load', 'value',
+                  'text',))
+    plain = measure(raw_values, None, None)
+    print(line % (('no compression', plain[0], '1.00',) +
+                  tuple('%.1f' % i for i in plain[1:])))
+    for codec in codecs:
+        settings.EAVKIT_COMPRESS_CODEC = codec
+        for title, text_threshold, blob_threshold in setups:
+            result = measure(raw_values, text_threshold, blob_threshold)
+            print(line % (('%s: %s' % (codec, title), result[0],
+                           '%.2f' % (float(result[0]) / plain[0]),) +
+                          tuple('%.1f' % i for i in result[1:])))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
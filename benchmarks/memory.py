@@ -0,0 +1,41 @@
+# coding: utf-8
+"""
+Memory used by eav attributes and entities of many in-memory instances.
+
+Creates N Product instances with eav data of 20 attributes, then measures
+process RSS growth after resolving attributes (schema) of all entities and
+after decoding their storage. Usage: python benchmarks/memory.py [N]
+"""
+import sys
+import json
+import random
+from common import Product, setup_database, get_rss, mib, product_values
+
+
+def main(count):
+    setup_database()
+    rnd = random.Random(0)
+    instances = [Product(pk=i, name='product %d' % i,
+                         eavdata=json.dumps(product_values(rnd)))
+                 for i in range(1, count + 1)]
+    base = get_rss()
+
+    for instance in instances:
+        instance.eav.attributes
+    schema = get_rss()
+
+    for instance in instances:
+        instance.eav.storage
+    storage = get_rss()
+
+    print('%d entities x %d attributes' % (
+        count, len(instances[0].eav.attributes)))
+    print('attributes: %8.1f MiB (%6d bytes per entity)' % (
+        mib(schema - base), (schema - base) // count))
+    print('storage:    %8.1f MiB (%6d bytes per entity)' % (
+        mib(storage - schema), (storage - schema) // count))
+    print('total:      %8.1f MiB' % mib(storage - base))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -1,16 +1,37 @@
 # coding: utf-8
+import re
 import copy
+import json
 from django.contrib import admin
 from django.contrib.admin.templatetags.admin_list import _boolean_icon
 from django.contrib.admin.options import ModelAdmin, InlineModelAdmin
 from django.contrib.admin.helpers import (InlineAdminFormSet, InlineAdminForm,
                                           AdminForm)
+from django.contrib.admin.views.main import ChangeList
+from django.db import connections, models
+from django.forms.forms import pretty_name
+from django.utils import six
+from django.utils.encoding import force_text
 from django.utils.translation import ugettext_lazy as _
 from django import forms
+from .attributes import MultipleMixin
 from .forms import BaseEntityForm
 
 
 eavattrs_js = ('eavkit/js/eavattrs_fieldset.js',)
+eavattrs_autocomplete_js = ('eavkit/js/eavattrs_autocomplete.js',)
+EAV_LIST_DISPLAY_PREFIX = 'eav__'
+
+
+def is_eav_list_display_item(item):
+    return (isinstance(item, six.string_types) and
+            item.startswith(EAV_LIST_DISPLAY_PREFIX) and
+            len(item) > len(EAV_LIST_DISPLAY_PREFIX))
+
+
+def regex_escape(value):
+    # escape only common regex metacharacters, supported by all db backends
+    return re.sub(r'([.^$*+?()\[\]{}|\\])', r'\\\1', value)
 
 
 # EAV Admin Base classes
@@ -22,6 +43,26 @@ class BaseEntityAdmin(admin.ModelAdmin):
         {'classes': ('eavattrs', 'collapse',), 'fields': None,},
     )  # if set to None, mix all fields in first fieldset
 
+    def __getattr__(self, name):
+        # list_display items like "eav__color" are resolved to eav columns
+        if is_eav_list_display_item(name):
+            return self.get_eav_list_display_field(
+                name[len(EAV_LIST_DISPLAY_PREFIX):])
+        raise AttributeError(
+            '%r object has no attribute %r' % (self.__class__.__name__, name))
+
+    def get_eav_list_display_field(self, slug):
+        def field(obj):
+            value = getattr(obj, obj._eav_config.eav_attr).get_value(slug)
+            if isinstance(value, (list, tuple)):
+                value = u', '.join(force_text(i) for i in value)
+            return value
+        field.short_description = pretty_name(slug)
+        return field
+
+    def get_changelist(self, request, **kwargs):
+        return EAVChangeList
+
     def get_eav_fieldsets(self, form, fieldsets, templates=None):
         template = (['eav_%s_fieldset_template' % i for i in templates]
                      if templates else ['eav_fieldset_template'])
@@ -62,6 +103,103 @@ class BaseEntityAdmin(admin.ModelAdmin):
         return inline_admin_formsets
 
 
+class EAVChangeList(ChangeList):
+    def get_results(self, request):
+        super(EAVChangeList, self).get_results(request)
+
+        # share cached schema with all entities of page, if schema cache is
+        # enabled (attributes do not depend on instance), eav columns decode
+        # only displayed attributes values (values cache hits are used as
+        # is, misses are not decoded and cached entirely)
+        if any(is_eav_list_display_item(i) for i in self.list_display):
+            instances = list(self.result_list)  # evaluate and cache results
+            if instances:
+                config = self.model._eav_config
+                if config.is_schema_cache_enabled():
+                    config.entity_cls.attach_attributes(
+                        instances, config.get_schema())
+                config.entity_cls.prefetch_values(
+                    instances, decode_missing=False)
+
+
+class EavAttributeListFilter(admin.SimpleListFilter):
+    """
+    Changelist filter by eav attribute value with options from attribute
+    choices, create it with the for_attribute factory method:
+        list_filter = (EavAttributeListFilter.for_attribute('color'),)
+    On PostgreSQL jsonb containment is used, on other backends and for binary
+    eav fields regex lookup by key/value pair of json encoded eav data
+    (compressed blobs are skipped).
+    """
+    eav_slug = None
+    # regex match of binary eav field, only uncompressed (json) blobs
+    binary_regex_sql = {
+        'postgresql': ("CASE WHEN substring(%(column)s from 1 for 1) ="
+                       " '{'::bytea THEN convert_from(%(column)s, 'UTF8')"
+                       " END ~ %%s"),
+        'sqlite': ("CASE WHEN substr(%(column)s, 1, 1) = X'7B'"
+                   " THEN CAST(%(column)s AS TEXT) END REGEXP %%s"),
+    }
+
+    @classmethod
+    def for_attribute(cls, slug, title=None):
+        return type(str('%sListFilter' % slug.title().replace('_', '')),
+                    (cls,), {'eav_slug': slug,
+                             'title': title or pretty_name(slug),
+                             'parameter_name': '%s%s' % (
+                                 EAV_LIST_DISPLAY_PREFIX, slug),})
+
+    def lookups(self, request, model_admin):
+        # filter is not bound to instance: attributes are resolved without it
+        config = model_admin.model._eav_config
+        attributes = (config.get_schema().values()
+                      if config.is_schema_cache_enabled() else
+                      config.get_attributes(instance=None))
+        self.eav_attribute = next(
+            (i for i in attributes if i.slug == self.eav_slug), None)
+        return (self.eav_attribute.choices or ()
+                if self.eav_attribute else ())
+
+    def get_encoded_value(self, value):
+        attribute = self.eav_attribute
+        if attribute.multiple and isinstance(attribute, MultipleMixin):
+            value = attribute.value_decode(value, multiple=False)
+        else:
+            value = attribute.value_decode(value)
+        return json.dumps(attribute.value_encode(value))
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value is None or not getattr(self, 'eav_attribute', None):
+            return queryset
+
+        encoded = self.get_encoded_value(value)
+        eav_field = queryset.model._eav_config.eav_field
+        field = queryset.model._meta.get_field(eav_field)
+        binary = isinstance(field, models.BinaryField)
+        connection = connections[queryset.db]
+        column = '%s.%s' % (
+            connection.ops.quote_name(queryset.model._meta.db_table),
+            connection.ops.quote_name(field.column))
+        if connection.vendor == 'postgresql' and not binary:
+            return queryset.extra(
+                where=["(CASE WHEN %s LIKE '{%%%%' THEN %s::jsonb END"
+                       " -> %%s) @> %%s::jsonb" % (column, column,)],
+                params=[self.eav_slug, encoded])
+
+        # data is written by json.dumps with default separators
+        key, encoded = (regex_escape(json.dumps(self.eav_slug)),
+                        regex_escape(encoded),)
+        regex = (u'%(key)s: (%(value)s[,}]|'
+                 u'\\[([^]]*, )?%(value)s(, [^]]*)?\\])'
+                 % {'key': key, 'value': encoded,})
+        sql = binary and self.binary_regex_sql.get(connection.vendor, None)
+        if sql:
+            return queryset.extra(where=[sql % {'column': column,}],
+                                  params=[regex])
+        return queryset.filter(**{'%s__regex' % eav_field: regex,})
+
+
 class EAVMinixInlineAdminFormSet(InlineAdminFormSet):
     def __iter__(self):
         # allow to customize fieldsets attribute in each form directly
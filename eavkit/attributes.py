@@ -1,40 +1,100 @@
 import datetime
+from bisect import bisect_left
 from django import forms
+from django.conf import settings
+from django.core.urlresolvers import reverse, NoReverseMatch
+from django.utils import six
+from django.utils.encoding import force_text
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 from django.utils.dateparse import parse_date, parse_datetime
 from eavkit import fields
+from eavkit.compression import CompressedText
 
 
 # Base Attribute class
 # --------------------
-class BaseAttribute(object):
+class AttributeBase(type):
+    """
+    Attributes metaclass: moves class level defaults of instance fields (e.g.
+    "required = True") to field_defaults, so they do not shadow slots, and
+    freezes instances after __init__, so subclasses may set own attributes
+    in __init__ as usual, but not after it.
+    """
+    fields = ('name', 'slug', 'description', 'required', 'multiple',
+              'choices', 'data',)
+
+    def __new__(mcs, name, bases, attrs):
+        defaults = {}
+        for base in reversed(bases):
+            defaults.update(getattr(base, 'field_defaults', {}))
+        defaults.update((k, attrs.pop(k),) for k in mcs.fields if k in attrs)
+        attrs['field_defaults'] = defaults
+        return super(AttributeBase, mcs).__new__(mcs, name, bases, attrs)
+
+    def __call__(cls, *args, **kwargs):
+        instance = super(AttributeBase, cls).__call__(*args, **kwargs)
+        object.__setattr__(instance, '_frozen', True)
+        return instance
+
+
+class BaseAttribute(six.with_metaclass(AttributeBase, object)):
+    """
+    Attribute instances are immutable (after __init__) and slotted, so the
+    same instance can be safely shared (as flyweight) by all entities with
+    the same schema.
+    """
+    __slots__ = ('name', 'slug', 'description', 'required', 'multiple',
+                 'choices', 'data', '_form_field', '_choices_table',
+                 '_choices_map', '_choices_index', '_frozen', '__weakref__',)
+
     datatype = None
     datatype_title = None
-
-    name = None
-    slug = None
-    description = None
-    required = False
-
-    multiple = None
-    choices = None
-
     form_field = None
-    data = None
+    required = False
 
     def __init__(self, name=None, slug=None, required=None, **kwargs):
         self.name = name
         self.slug = slug
         self.description = kwargs.get('description', u'')
 
-        self.required = required if required is not None else self.required
+        self.required = (required if required is not None else
+                         self.field_defaults['required'])
         self.choices = kwargs.get('choices', None)
         self.multiple = kwargs.get('multiple', None)
-        self.form_field = kwargs.get('form_field', self.form_field)
+        self._form_field = kwargs.get('form_field', None)
 
         self.data = kwargs.get('data', None)
 
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(
+                '%s instances are immutable' % self.__class__.__name__)
+        super(BaseAttribute, self).__setattr__(name, value)
+
+    def __delattr__(self, name):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(
+                '%s instances are immutable' % self.__class__.__name__)
+        super(BaseAttribute, self).__delattr__(name)
+
+    def __getstate__(self):
+        # filled slots of all classes in mro and dict of unslotted subclasses
+        slots = {}
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name != '__weakref__' and hasattr(self, name):
+                    slots[name] = getattr(self, name)
+        return (getattr(self, '__dict__', None) or None, slots,)
+
+    def __setstate__(self, state):
+        # pickle and copy support, state is (dict, slots) tuple or dict
+        state, slots = state if isinstance(state, tuple) else (state, None,)
+        init = super(BaseAttribute, self).__setattr__
+        for key, value in list((state or {}).items()) + list(
+                (slots or {}).items()):
+            init(key, value)
+
     def validate(self, value):
         raise NotImplementedError()
 
@@ -69,7 +129,7 @@ class BaseAttribute(object):
     def get_form_field(self, value=None):
         kwargs = self.get_form_field_defaults()
         kwargs.update(initial=value)
-        return self.form_field(**kwargs)
+        return (self._form_field or self.form_field)(**kwargs)
 
     def clean_attribute_model_instance(self, instance):
         pass
@@ -78,9 +138,86 @@ class BaseAttribute(object):
 # Attribute Mixins
 # ----------------
 class ChoicesMixin(BaseAttribute):
+    __slots__ = ()
+
     form_field_choices = forms.TypedChoiceField
     form_field_coerce = None
 
+    def decode_choice(self, value):
+        return self.value_decode(value)
+
+    def get_choices_table(self):
+        """
+        Get choices with decoded values, compiled once per attribute instance
+        (the only cached data, attributes are shared between entities).
+        """
+        table = getattr(self, '_choices_table', None)
+        if table is None:
+            table = tuple((self.decode_choice(cvalue), ctitle)
+                          for cvalue, ctitle in self.choices or ())
+            super(BaseAttribute, self).__setattr__('_choices_table', table)
+        return table
+
+    def get_choices_map(self):
+        """Get dict of choices titles by text value for O(1) lookups."""
+        table = getattr(self, '_choices_map', None)
+        if table is None:
+            table = dict((force_text(cvalue), ctitle,)
+                         for cvalue, ctitle in self.get_choices_table())
+            super(BaseAttribute, self).__setattr__('_choices_map', table)
+        return table
+
+    def get_choices_index(self):
+        """Get choices sorted by lower cased title for prefix search."""
+        table = getattr(self, '_choices_index', None)
+        if table is None:
+            table = sorted((force_text(ctitle).lower(), force_text(cvalue),
+                            ctitle,)
+                           for cvalue, ctitle in self.get_choices_table())
+            table = (tuple(i[0] for i in table),
+                     tuple((i[1], i[2],) for i in table),)
+            super(BaseAttribute, self).__setattr__('_choices_index', table)
+        return table
+
+    def search_choices(self, query, page=1, per_page=20):
+        """
+        Search choices by title prefix, returns page of (value, title) pairs
+        and flag of next page existence.
+        """
+        keys, choices = self.get_choices_index()
+        query = force_text(query).strip().lower()
+        start = bisect_left(keys, query) + (page - 1) * per_page
+        results = []
+        for index in range(start, min(start + per_page + 1, len(keys))):
+            if not keys[index].startswith(query):
+                break
+            results.append(choices[index])
+        return results[:per_page], len(results) > per_page
+
+    def is_autocomplete(self):
+        threshold = getattr(
+            settings, 'EAVKIT_CHOICES_AUTOCOMPLETE_THRESHOLD', None)
+        return bool(threshold is not None and self.choices and
+                    len(self.choices) > threshold)
+
+    def get_autocomplete_url(self):
+        try:
+            return reverse('eavkit_choices_autocomplete',
+                           kwargs={'slug': self.slug,})
+        except NoReverseMatch:
+            return None
+
+    def get_autocomplete_form_field(self, value, field_cls):
+        url = self.is_autocomplete() and self.get_autocomplete_url()
+        if not url:
+            return None
+        kwargs = self.get_form_field_defaults()
+        kwargs.update(initial=value, coerce=self.form_field_coerce,
+                      choices_map=self.get_choices_map(), url=url)
+        field_cls is fields.AutocompleteChoiceField and kwargs.update(
+            empty_value=None)
+        return field_cls(**kwargs)
+
     def clean_attribute_model_instance(self, instance):
         super(ChoicesMixin, self).clean_attribute_model_instance(instance)
         if self.choices:
@@ -101,8 +238,12 @@ class ChoicesMixin(BaseAttribute):
         if not self.choices:
             return super(ChoicesMixin, self).get_form_field(value)
 
-        choices = [(None, u'',)] + [(self.value_decode(cvalue), ctitle)
-                                    for cvalue, ctitle in self.choices]
+        field = self.get_autocomplete_form_field(
+            value, fields.AutocompleteChoiceField)
+        if field is not None:
+            return field
+
+        choices = [(None, u'',)] + list(self.get_choices_table())
         kwargs = self.get_form_field_defaults()
         kwargs.update(initial=value, choices=choices,
                       coerce=self.form_field_coerce,
@@ -111,6 +252,8 @@ class ChoicesMixin(BaseAttribute):
 
 
 class MultipleMixin(BaseAttribute):
+    __slots__ = ()
+
     form_field_multiple = fields.TextMultipleValuesField
     form_field_multiple_delimiter = None
     form_field_coerce = None
@@ -148,14 +291,23 @@ class MultipleMixin(BaseAttribute):
 
 
 class MultipleChoicesMixin(MultipleMixin, ChoicesMixin):
+    __slots__ = ()
+
     form_field_choices_multiple = forms.TypedMultipleChoiceField
 
+    def decode_choice(self, value):
+        return self.value_decode(value, multiple=False)
+
     def get_form_field(self, value=None):
         if not self.multiple or not self.choices:
             return super(MultipleChoicesMixin, self).get_form_field(value)
 
-        choices = [(self.value_decode(cvalue, multiple=False), ctitle)
-                   for cvalue, ctitle in self.choices]
+        field = self.get_autocomplete_form_field(
+            value, fields.AutocompleteMultipleChoiceField)
+        if field is not None:
+            return field
+
+        choices = list(self.get_choices_table())
         kwargs = self.get_form_field_defaults()
         kwargs.update(initial=value, choices=choices,
                       coerce=self.form_field_coerce)
@@ -165,6 +317,8 @@ class MultipleChoicesMixin(MultipleMixin, ChoicesMixin):
 # Common types base classes
 # -------------------------
 class BaseStringAttribute(BaseAttribute):
+    __slots__ = ()
+
     datatype = 'string'
     datatype_title = _('String')
     form_field = forms.CharField
@@ -181,6 +335,8 @@ class BaseStringAttribute(BaseAttribute):
 
 
 class BaseIntegerAttribute(BaseAttribute):
+    __slots__ = ()
+
     datatype = 'integer'
     datatype_title = _('Integer')
     form_field = forms.IntegerField
@@ -199,6 +355,8 @@ class BaseIntegerAttribute(BaseAttribute):
 
 
 class BaseFloatAttribute(BaseAttribute):
+    __slots__ = ()
+
     datatype = 'float'
     datatype_title = _('Float')
     form_field = forms.FloatField
@@ -219,14 +377,43 @@ class BaseFloatAttribute(BaseAttribute):
 # Attribute classes
 # -----------------
 class StringAttribute(MultipleChoicesMixin, BaseStringAttribute):
+    __slots__ = ()
+
     form_field_coerce = unicode
     form_field_multiple_delimiter = '\n'
 
 
 class TextAttribute(BaseStringAttribute):
+    __slots__ = ()
+
     datatype = 'text'
     datatype_title = _('Text')
 
+    # values not shorter than threshold (in chars) are stored compressed,
+    # None means EAVKIT_TEXT_COMPRESS_THRESHOLD setting value (disabled)
+    compress_threshold = None
+
+    def get_compress_threshold(self):
+        return (self.compress_threshold
+                if self.compress_threshold is not None else
+                getattr(settings, 'EAVKIT_TEXT_COMPRESS_THRESHOLD', None))
+
+    def value_decode(self, value):
+        # compressed value is decompressed lazily, on attribute read
+        compressed = CompressedText.from_encoded(value)
+        return (compressed if compressed is not None else
+                super(TextAttribute, self).value_decode(value))
+
+    def value_encode(self, value):
+        if isinstance(value, CompressedText):
+            return value.encode()  # not changed, do not recompress
+        value = super(TextAttribute, self).value_encode(value)
+        if isinstance(value, basestring):
+            value = CompressedText.compress(
+                value, threshold=self.get_compress_threshold())
+        return (value.encode() if isinstance(value, CompressedText) else
+                value)
+
     def get_form_field_defaults(self):
         kwargs = super(TextAttribute, self).get_form_field_defaults()
         kwargs.update(widget=forms.Textarea)
@@ -234,16 +421,22 @@ class TextAttribute(BaseStringAttribute):
 
 
 class IntegerAttribute(MultipleChoicesMixin, BaseIntegerAttribute):
+    __slots__ = ()
+
     form_field_coerce = int
     form_field_multiple_delimiter = '\n'
 
 
 class FloatAttribute(MultipleChoicesMixin, BaseFloatAttribute):
+    __slots__ = ()
+
     form_field_coerce = float
     form_field_multiple_delimiter = '\n'
 
 
 class BooleanAttribute(BaseAttribute):
+    __slots__ = ()
+
     datatype = 'bool'
     datatype_title = _('Boolean')
     form_field = forms.NullBooleanField
@@ -260,6 +453,8 @@ class BooleanAttribute(BaseAttribute):
 
 
 class DateAttribute(BaseAttribute):
+    __slots__ = ()
+
     datatype = 'date'
     datatype_title = _('Date')
     form_field = forms.DateField
@@ -277,6 +472,8 @@ class DateAttribute(BaseAttribute):
 
 
 class DateTimeAttribute(BaseAttribute):
+    __slots__ = ()
+
     datatype = 'datetime'
     datatype_title = _('Date and Time')
     form_field = forms.DateTimeField
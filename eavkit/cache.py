@@ -0,0 +1,110 @@
+# coding: utf-8
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+
+
+def copy_values(values):
+    # decoded values are immutable, except lists of multiple attributes
+    return dict((k, list(v) if isinstance(v, list) else v,)
+                for k, v in values.items())
+
+
+class DjangoValueCache(object):
+    """Decoded eav values cache backed by django cache framework."""
+
+    def __init__(self, alias='default', timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def set_many(self, items):
+        # items is dict of key: (values, size), size is ignored
+        data = dict((k, v[0],) for k, v in items.items())
+        if self.timeout is None:
+            self.cache.set_many(data)
+        else:
+            self.cache.set_many(data, self.timeout)
+
+    def delete_many(self, keys):
+        self.cache.delete_many(keys)
+
+
+class LRUValueCache(object):
+    """
+    In-process decoded eav values cache with LRU eviction by total size,
+    size of each item is a length of raw eav data it is decoded from.
+    """
+
+    def __init__(self, max_size=32*1024*1024):
+        self.max_size = max_size
+        self.size = 0
+        self.data = OrderedDict()  # key: (values, size)
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        result = {}
+        with self.lock:
+            for key in keys:
+                item = self.data.pop(key, None)
+                if item is not None:
+                    self.data[key] = item  # move to the end (recently used)
+                    result[key] = copy_values(item[0])
+        return result
+
+    def set_many(self, items):
+        with self.lock:
+            for key, (values, size) in items.items():
+                if size > self.max_size:
+                    continue
+                item = self.data.pop(key, None)
+                if item is not None:
+                    self.size -= item[1]
+                self.data[key] = (copy_values(values), size,)
+                self.size += size
+            while self.size > self.max_size:
+                self.size -= self.data.popitem(last=False)[1][1]
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                item = self.data.pop(key, None)
+                if item is not None:
+                    self.size -= item[1]
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.size = 0
+
+
+_value_cache = None  # (settings, cache)
+
+
+def get_value_cache():
+    """
+    Get decoded eav values cache defined by EAVKIT_VALUE_CACHE setting:
+    None (disabled, default), 'lru' (in-process LRU cache with size limited by
+    EAVKIT_VALUE_CACHE_SIZE) or django cache alias (with optional timeout
+    EAVKIT_VALUE_CACHE_TIMEOUT). Cache is recreated if settings are changed.
+    """
+    global _value_cache
+    backend = getattr(settings, 'EAVKIT_VALUE_CACHE', None)
+    if not backend:
+        return None
+    options = (backend,
+               getattr(settings, 'EAVKIT_VALUE_CACHE_SIZE', 32*1024*1024),
+               getattr(settings, 'EAVKIT_VALUE_CACHE_TIMEOUT', None),)
+    cached = _value_cache
+    if cached is None or cached[0] != options:
+        cache = (LRUValueCache(options[1]) if backend == 'lru' else
+                 DjangoValueCache(backend, options[2]))
+        cached = _value_cache = (options, cache,)
+    return cached[1]
@@ -0,0 +1,125 @@
+# coding: utf-8
+"""
+Compression of large text attributes values and whole eav data blobs.
+
+Compressed text value is stored in json as {"$<codec>": "<base64 data>"}
+object and decompressed lazily, only when attribute value is read. Compressed
+blob is stored as "<codec>:<base64 data>" text (or b"<codec>:<data>" bytes
+for binary fields), json blob always starts with "{", so it is unambiguous.
+"""
+import zlib
+import base64
+import importlib
+from django.conf import settings
+from django.utils import six
+
+
+CODECS = ('zlib', 'zstd',)
+
+
+def get_codec():
+    return getattr(settings, 'EAVKIT_COMPRESS_CODEC', 'zlib')
+
+
+def get_zstandard():
+    try:
+        return importlib.import_module('zstandard')
+    except ImportError:
+        raise ImportError('zstandard is required for "zstd" eav compression'
+                          ' codec, install it with "pip install zstandard".')
+
+
+def compress(data, codec):
+    if codec == 'zlib':
+        return zlib.compress(data, 6)
+    if codec == 'zstd':
+        return get_zstandard().ZstdCompressor(level=3).compress(data)
+    raise ValueError('Unknown eav compression codec "%s".' % codec)
+
+
+def decompress(data, codec):
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'zstd':
+        return get_zstandard().ZstdDecompressor().decompress(data)
+    raise ValueError('Unknown eav compression codec "%s".' % codec)
+
+
+class CompressedText(object):
+    """Compressed text value, decompressed on demand."""
+    __slots__ = ('codec', 'data',)
+
+    def __init__(self, codec, data):
+        self.codec = codec
+        self.data = data
+
+    def __reduce__(self):
+        # slotted class, picklable with any protocol (e.g. python-memcached)
+        return (self.__class__, (self.codec, self.data,),)
+
+    @classmethod
+    def compress(cls, text, codec=None, threshold=None):
+        """
+        Compress text, if it is not shorter than threshold and compressed
+        value is shorter than text, otherwise return text as is.
+        """
+        if threshold is None or len(text) < threshold:
+            return text
+        codec = codec or get_codec()
+        data = base64.b64encode(
+            compress(text.encode('utf-8'), codec)).decode('ascii')
+        return cls(codec, data) if len(data) < len(text) else text
+
+    @classmethod
+    def from_encoded(cls, value):
+        if isinstance(value, dict) and len(value) == 1:
+            key, data = next(iter(value.items()))
+            if key.startswith('$') and key[1:] in CODECS:
+                return cls(key[1:], data)
+        return None
+
+    def encode(self):
+        return {'$%s' % self.codec: self.data,}
+
+    def decompress(self):
+        return decompress(base64.b64decode(self.data),
+                          self.codec).decode('utf-8')
+
+
+def decompressed(value):
+    return value.decompress() if isinstance(value, CompressedText) else value
+
+
+def compress_blob(data, codec=None, threshold=None, binary=False):
+    """Compress json blob, if it is not shorter than threshold."""
+    if threshold is None or len(data) < threshold:
+        return data.encode('utf-8') if binary else data
+    codec = codec or get_codec()
+    data = compress(data.encode('utf-8'), codec)
+    return (codec.encode('ascii') + b':' + data if binary else
+            u'%s:%s' % (codec, base64.b64encode(data).decode('ascii'),))
+
+
+def normalize_blob(data):
+    """
+    Get eav data blob as text or bytes, binary field values are read as
+    memoryview (or buffer on python 2) by some database backends.
+    """
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    if six.PY2 and isinstance(data, buffer):
+        return bytes(data)
+    return data
+
+
+def decompress_blob(data):
+    """Get json text of eav data blob (text or bytes), compressed or not."""
+    binary = isinstance(data, six.binary_type)
+    if data[:1] in (u'{', b'{',):
+        return data.decode('utf-8') if binary else data
+    codec, data = data.split(b':' if binary else u':', 1)
+    if binary:
+        codec = codec.decode('ascii')
+    else:
+        data = base64.b64decode(data)
+    return decompress(data, codec).decode('utf-8')
@@ -1,4 +1,7 @@
+import os
+import sys
 from django.apps import AppConfig
+from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 
 
@@ -7,5 +10,39 @@ class EAVConfig(AppConfig):
     name = u'eavkit'
     verbose_name = _(u'EAV Kit')
 
+    # management commands, which serve requests and need schema warm-up
+    warmup_commands = ('runserver',)
+
     def ready(self):
-        pass
+        if getattr(settings, 'EAVKIT_WARMUP', False) and self.need_warmup():
+            self.warmup()
+
+    def need_warmup(self, argv=None):
+        argv = sys.argv if argv is None else argv
+        script = os.path.basename(argv[0]) if argv else ''
+        if not script in ('manage.py', 'django-admin', 'django-admin.py',
+                          '__main__.py',):
+            return True  # not a management command (wsgi server, etc)
+
+        command = argv[1] if len(argv) > 1 else None
+        commands = getattr(settings, 'EAVKIT_WARMUP_COMMANDS',
+                           self.warmup_commands)
+        if not command in commands:
+            return False
+        if (command == 'runserver' and not '--noreload' in argv and
+                not os.environ.get('RUN_MAIN') == 'true'):
+            return False  # autoreloader parent process, does not serve
+        return True
+
+    def warmup(self):
+        from django.core.cache import caches
+        from django.db import connections
+        from .registry import registry
+
+        registry.warmup()
+
+        # do not share opened connections with forked worker processes
+        for connection in connections.all():
+            connection.close()
+        for cache in caches.all():
+            cache.close()
@@ -0,0 +1,275 @@
+# coding: utf-8
+"""
+Export of eav attributes values of queryset to columns: NumPy arrays or
+pandas DataFrame (numpy and pandas are optional dependencies).
+
+Raw eav data is streamed by chunks and decoded directly into typed buffers
+with null masks, so memory is proportional to output columns, not to model
+instances, which are never created.
+"""
+import json
+import datetime
+import importlib
+from array import array
+from collections import OrderedDict
+from django.db import models
+from django.utils import timezone
+from .attributes import (BaseIntegerAttribute, BaseFloatAttribute,
+                         BooleanAttribute, DateAttribute, DateTimeAttribute,
+                         MultipleMixin)
+from .compression import decompressed, decompress_blob, normalize_blob
+
+
+try:
+    INT_TYPECODE = array('q').typecode
+except ValueError:
+    INT_TYPECODE = 'l'  # 64 bit on python 2 posix platforms
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+EPOCH_DATETIME = datetime.datetime(1970, 1, 1)
+
+
+def import_optional(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        raise ImportError('%s is required for eav data export,'
+                          ' install it with "pip install %s".' % (name, name))
+
+
+def buffer_to_numpy(values, dtype):
+    numpy = import_optional('numpy')
+    return (numpy.frombuffer(values, dtype=dtype) if len(values) else
+            numpy.empty(0, dtype=dtype))
+
+
+def pandas_array(values, mask, dtype):
+    """
+    Nullable pandas array of values with nulls mask: pandas IntegerArray and
+    BooleanArray (pandas >= 1.0, object array with NaN for older versions)
+    for integers and booleans, NaN/NaT/None for other dtypes.
+    """
+    numpy, pandas = import_optional('numpy'), import_optional('pandas')
+    values, mask = values.copy(), mask.copy()
+    if dtype == 'int64':
+        return pandas.arrays.IntegerArray(values, mask)
+    if dtype == 'bool':
+        if hasattr(pandas.arrays, 'BooleanArray'):
+            return pandas.arrays.BooleanArray(values, mask)
+        values = values.astype(object)
+    values[mask] = (None if dtype == 'object' else
+                    numpy.datetime64('NaT') if dtype.startswith('datetime64')
+                    else numpy.nan)
+    return values
+
+
+def date_to_days(value):
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def datetime_to_microseconds(value):
+    if timezone.is_aware(value):
+        value = timezone.make_naive(value, timezone.utc)
+    delta = value - EPOCH_DATETIME
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+class Column(object):
+    """
+    Buffer of one attribute values: typed array with null mask for integer,
+    float, boolean, date and datetime attributes, list for other ones.
+    Multiple attribute values are stored as lists or, if exploded, as
+    flattened values with row numbers.
+    """
+    # attribute base class: (array typecode, numpy dtype, converter)
+    types = (
+        (BooleanAttribute, ('b', 'bool', int,)),
+        (BaseIntegerAttribute, (INT_TYPECODE, 'int64', int,)),
+        (BaseFloatAttribute, ('d', 'float64', float,)),
+        (DateAttribute, (INT_TYPECODE, 'datetime64[D]', date_to_days,)),
+        (DateTimeAttribute, (INT_TYPECODE, 'datetime64[us]',
+                             datetime_to_microseconds,)),
+    )
+
+    def __init__(self, attribute, explode=False):
+        self.attribute = attribute
+        self.multiple = bool(attribute.multiple and
+                             isinstance(attribute, MultipleMixin))
+        self.explode = self.multiple and explode
+        self.typecode, self.dtype, self.convert = next(
+            (v for k, v in self.types if isinstance(attribute, k)),
+            (None, 'object', None,))
+        if self.multiple and not self.explode:
+            self.typecode, self.dtype, self.convert = None, 'object', None
+
+        self.values = array(self.typecode) if self.typecode else []
+        self.mask = bytearray()
+        self.rows = array(INT_TYPECODE) if self.explode else None
+
+    def append(self, row, value):
+        if self.explode:
+            for item in value or ():
+                self.values.append(self.convert(item) if self.convert else
+                                   item)
+                self.rows.append(row)
+        elif value is None:
+            self.values.append(0 if self.typecode else None)
+            self.mask.append(1)
+        else:
+            self.values.append(self.convert(value) if self.typecode else
+                               value)
+            self.mask.append(0)
+
+    def to_numpy(self):
+        numpy = import_optional('numpy')
+        if not self.typecode:
+            values = numpy.empty(len(self.values), dtype=object)
+            for index, value in enumerate(self.values):
+                values[index] = value  # keep lists as objects
+        else:
+            values = buffer_to_numpy(self.values, 'f8' if self.typecode == 'd'
+                                     else 'i%d' % self.values.itemsize)
+            values = values.astype(self.dtype) if self.typecode == 'b' else (
+                values.view(self.dtype) if self.dtype.startswith(
+                    'datetime64') else values)
+        if self.explode:
+            return values
+        mask = buffer_to_numpy(self.mask, 'bool')
+        return (numpy.ma.MaskedArray(values, mask=mask) if self.typecode
+                else values)
+
+    def to_pandas(self):
+        numpy = import_optional('numpy')
+        values = self.to_numpy()
+        if not isinstance(values, numpy.ma.MaskedArray):
+            return values
+        return pandas_array(values.data, numpy.ma.getmaskarray(values),
+                            self.dtype)
+
+    def to_pandas_exploded(self, positions, size):
+        """Exploded values placed at positions of size rows, others are nulls."""
+        numpy = import_optional('numpy')
+        values = self.to_numpy()
+        data = numpy.zeros(size, dtype=values.dtype)
+        mask = numpy.ones(size, dtype='bool')
+        data[positions], mask[positions] = values, False
+        return pandas_array(data, mask, self.dtype)
+
+
+def iter_raw_data(queryset, eav_field, chunk_size):
+    """
+    Yield (pk, raw eav data) pairs, loaded by chunks ordered by pk (keyset
+    pagination) or with queryset iterator, if queryset can not be filtered.
+    """
+    queryset = queryset.values_list('pk', eav_field)
+    if not queryset.query.can_filter():
+        for row in queryset.iterator():
+            yield row
+        return
+
+    queryset, last = queryset.order_by('pk'), None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        chunk = list(chunk[:chunk_size])
+        for row in chunk:
+            yield row
+        if len(chunk) < chunk_size:
+            break
+        last = chunk[-1][0]
+
+
+def export_columns(queryset, slugs, chunk_size=2000, multiple='list'):
+    """
+    Decode attributes values of all queryset rows (ordered by pk) into
+    columns buffers, returns (pks, OrderedDict of slug: Column) pair.
+    Multiple attributes values are lists ('list' mode) or flattened values
+    with row numbers ('explode' mode).
+    """
+    if multiple not in ('list', 'explode',):
+        raise ValueError('Unknown multiple mode "%s", "list" or "explode"'
+                         ' expected.' % multiple)
+    config = queryset.model._eav_config
+    schema = config.get_schema()
+    columns = OrderedDict((slug, Column(schema[slug],
+                                        explode=multiple == 'explode'),)
+                          for slug in slugs)
+    pks = (array(INT_TYPECODE) if isinstance(
+        queryset.model._meta.pk, (models.AutoField, models.IntegerField,))
+        else [])
+
+    for row, (pk, data) in enumerate(
+            iter_raw_data(queryset, config.eav_field, chunk_size)):
+        pks.append(pk)
+        data = normalize_blob(data)
+        data = json.loads(decompress_blob(data)) if data else {}
+        for slug, column in columns.items():
+            value = data.get(slug, None)
+            column.append(row, decompressed(column.attribute.value_decode(
+                value)) if not value is None else None)
+    return pks, columns
+
+
+def export_arrays(queryset, slugs, chunk_size=2000, multiple='list'):
+    """
+    Export attributes values to OrderedDict of NumPy arrays: "pk" and each
+    of slugs. Typed attributes are masked arrays (mask marks nulls), others
+    are object arrays. In 'explode' multiple mode multiple attributes are
+    flattened values arrays with additional "<slug>__row" row numbers arrays.
+    """
+    numpy = import_optional('numpy')
+    pks, columns = export_columns(queryset, slugs, chunk_size, multiple)
+    result = OrderedDict(pk=numpy.array(pks))
+    for slug, column in columns.items():
+        result[slug] = column.to_numpy()
+        if column.explode:
+            result['%s__row' % slug] = buffer_to_numpy(
+                column.rows, 'i%d' % column.rows.itemsize)
+    return result
+
+
+def explode_positions(columns, count):
+    """
+    Get rows layout of exploded columns: source row number of each output
+    row and output positions of each exploded column values. Each source row
+    takes as many output rows as its longest multiple value (at least one),
+    values of different multiple attributes are placed side by side, not
+    multiplied (no cross product).
+    """
+    numpy = import_optional('numpy')
+    rows = OrderedDict(
+        (slug, buffer_to_numpy(column.rows, 'i%d' % column.rows.itemsize),)
+        for slug, column in columns.items() if column.explode)
+    counts = numpy.ones(count, dtype='int64')
+    for slug_rows in rows.values():
+        counts = numpy.maximum(counts, numpy.bincount(slug_rows,
+                                                      minlength=count))
+    offsets = numpy.cumsum(counts) - counts
+    positions = OrderedDict(
+        (slug, offsets[slug_rows] + numpy.arange(len(slug_rows)) -
+         numpy.searchsorted(slug_rows, slug_rows),)
+        for slug, slug_rows in rows.items())  # row offset + index in row
+    return numpy.repeat(numpy.arange(count), counts), positions
+
+
+def export_dataframe(queryset, slugs, chunk_size=2000, multiple='list'):
+    """
+    Export attributes values to pandas DataFrame indexed by pk with nullable
+    columns. Multiple attributes are lists or, in 'explode' mode, exploded
+    to one row per value: values of several multiple attributes share rows
+    of their source row, shorter ones are padded with nulls.
+    """
+    numpy, pandas = import_optional('numpy'), import_optional('pandas')
+    pks, columns = export_columns(queryset, slugs, chunk_size, multiple)
+    pks, data = numpy.array(pks), OrderedDict()
+    if multiple == 'explode':
+        row_index, positions = explode_positions(columns, len(pks))
+        for slug, column in columns.items():
+            data[slug] = (column.to_pandas_exploded(positions[slug],
+                                                    len(row_index))
+                          if column.explode else
+                          column.to_pandas()[row_index])
+        pks = pks[row_index]
+    else:
+        data = OrderedDict((slug, column.to_pandas(),)
+                           for slug, column in columns.items())
+    return pandas.DataFrame(data, index=pandas.Index(pks, name='pk'),
+                            columns=list(columns.keys()))
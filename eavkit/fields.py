@@ -1,4 +1,5 @@
 from django import forms
+from django.utils.encoding import force_text
 
 
 class BaseMultipleValuesField(forms.CharField):
@@ -47,3 +48,63 @@ class CharMultipleValuesField(BaseMultipleValuesField):
 class TextMultipleValuesField(BaseMultipleValuesField):
     widget = forms.Textarea
     delimiter = u'\n'
+
+
+class AutocompleteSelect(forms.Select):
+    """
+    Select widget, which renders only selected options, other options are
+    loaded by eavattrs_autocomplete.js from the url (data-autocomplete-url).
+    """
+    def __init__(self, attrs=None, url=None, choices_map=None):
+        super(AutocompleteSelect, self).__init__(attrs)
+        self.url = url
+        self.choices_map = choices_map or {}
+
+    def get_selected_choices(self, value):
+        values = value if isinstance(value, (list, tuple)) else [value]
+        values = [force_text(i) for i in values if i not in (None, u'',)]
+        return [(i, self.choices_map[i],)
+                for i in values if i in self.choices_map]
+
+    def render(self, name, value, *args, **kwargs):
+        self.choices = ([] if self.allow_multiple_selected else
+                        [(u'', u'---------',)])
+        self.choices += self.get_selected_choices(value)
+
+        attrs = dict(kwargs.pop('attrs', None) or (args and args[0]) or {})
+        attrs.update({'class': u' '.join(filter(None, (
+                          attrs.get('class'), u'eavattrs-autocomplete',))),
+                      'data-autocomplete-url': self.url,})
+        return super(AutocompleteSelect, self).render(
+            name, value, attrs, *args[1:], **kwargs)
+
+
+class AutocompleteSelectMultiple(AutocompleteSelect, forms.SelectMultiple):
+    pass
+
+
+class AutocompleteFieldMixin(object):
+    """
+    Choices field mixin for autocomplete widgets, choices are not rendered
+    and value is validated by choices_map (text value: title) membership.
+    """
+    def __init__(self, *args, **kwargs):
+        self.choices_map = kwargs.pop('choices_map')
+        url = kwargs.pop('url')
+        kwargs['choices'] = ()
+        super(AutocompleteFieldMixin, self).__init__(*args, **kwargs)
+        self.widget.url = url
+        self.widget.choices_map = self.choices_map
+
+    def valid_value(self, value):
+        return force_text(value) in self.choices_map
+
+
+class AutocompleteChoiceField(AutocompleteFieldMixin,
+                              forms.TypedChoiceField):
+    widget = AutocompleteSelect
+
+
+class AutocompleteMultipleChoiceField(AutocompleteFieldMixin,
+                                      forms.TypedMultipleChoiceField):
+    widget = AutocompleteSelectMultiple
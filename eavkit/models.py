@@ -2,8 +2,10 @@
 import re
 import json
 import copy
+import hashlib
+import weakref
 from collections import OrderedDict
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 from django.utils.translation import ugettext_lazy as _
@@ -11,6 +13,9 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.models import Site
 from django.conf import settings
 from .attributes import StringAttribute
+from .cache import get_value_cache
+from .compression import (CompressedText, decompressed, compress_blob,
+                          decompress_blob, normalize_blob)
 
 
 validate_slug = RegexValidator(
@@ -21,6 +26,9 @@ validate_slug = RegexValidator(
 )
 
 
+attributes_pool = weakref.WeakValueDictionary()
+
+
 class BaseAttributeOptions(models.Model):
     DATATYPE_CHOICES = (('', '---',),)
 
@@ -61,13 +69,22 @@ class BaseAttributeOptions(models.Model):
         return u'%s (%s)' % (self.name, self.get_datatype_display())
 
     def get_attribute(self):
+        # attributes are flyweights: all options rows with the same values
+        # share one attribute instance, which does not refer to the row
         if not hasattr(self, '_attribute'):
             from .registry import registry
             attr_cls = registry.attributes.get(self.datatype) or StringAttribute
-            self._attribute = attr_cls(
-                name=self.name, slug=self.slug, required=self.required,
-                description=self.description, choices=self.get_choices(),
-                multiple=self.multiple, data={'instance': self,})
+            key = (self.__class__, attr_cls, self.pk, self.name, self.slug,
+                   self.required, self.description, self.choices,
+                   self.multiple, self.code,)
+            attribute = attributes_pool.get(key)
+            if attribute is None:
+                attribute = attributes_pool[key] = attr_cls(
+                    name=self.name, slug=self.slug, required=self.required,
+                    description=self.description, choices=self.get_choices(),
+                    multiple=self.multiple,
+                    data={'pk': self.pk, 'code': self.code,})
+            self._attribute = attribute
         return self._attribute
 
     def clean(self):
@@ -86,14 +103,85 @@ class BaseAttributeOptions(models.Model):
         return choices
 
 
+class Schema(OrderedDict):
+    """
+    Ordered mapping of attributes by slug. Schemas are interned: entities
+    with the same attributes refer to one shared, immutable schema instead of
+    a copy.
+    """
+    pool = weakref.WeakValueDictionary()
+
+    def __init__(self, *args, **kwargs):
+        super(Schema, self).__init__(*args, **kwargs)
+        self._frozen = True
+
+    def __setitem__(self, key, value, *args, **kwargs):
+        if getattr(self, '_frozen', False):
+            self.immutable()
+        super(Schema, self).__setitem__(key, value, *args, **kwargs)
+
+    def __reduce__(self):
+        return (self.__class__, (list(self.items()),),)
+
+    def immutable(self, *args, **kwargs):
+        raise TypeError('%s instances are immutable' % self.__class__.__name__)
+
+    __delitem__ = update = pop = popitem = clear = setdefault = __ior__ = (
+        immutable)
+
+    @classmethod
+    def intern(cls, attributes):
+        if isinstance(attributes, cls):
+            return attributes
+        attributes = tuple(attributes)
+        schema = cls.pool.get(attributes)
+        if schema is None:
+            schema = cls.pool[attributes] = cls(
+                (i.slug, i,) for i in attributes)
+        return schema
+
+    @property
+    def signature(self):
+        """Hash of attributes, which define eav data decoding."""
+        if not hasattr(self, '_signature'):
+            self._signature = hashlib.md5(repr([
+                (i.__class__.__name__, i.datatype, i.slug, bool(i.multiple),)
+                for i in self.values()
+            ]).encode('utf-8')).hexdigest()
+        return self._signature
+
+    def compile(self):
+        """Precompile attributes data (choices tables) once per schema."""
+        for attribute in self.values():
+            if attribute.choices and hasattr(attribute, 'get_choices_table'):
+                attribute.get_choices_table()
+        return self
+
+
 class Entity(object):
     """
     The Entity class, attributes data container, that will be attached to any
     entity registered with eavkit.
     """
+    __slots__ = ('instance', '__attributes__', '__storage__', '__raw__',
+                 '__siblings__',)
+
+    bulk_batch_size = 100
+    deferred_batch_size = 500
+
     def __init__(self, instance):
         super(Entity, self).__setattr__('instance', instance)
 
+    def __getstate__(self):
+        # pickle and copy support, siblings are not kept (load time only)
+        return dict((name, getattr(self, name),) for name in self.__slots__
+                    if name != '__siblings__' and hasattr(self, name))
+
+    def __setstate__(self, state):
+        # restore slots directly, __setattr__ requires instance and attributes
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
     def __getattr__(self, name):
         if name.startswith('_'):
             return super(Entity, self).__getattr__(name)
@@ -101,7 +189,7 @@ class Entity(object):
             raise AttributeError(
                 _(u'%(obj)s has no EAV attribute named "%(attr)s"')
                 % {'obj': self.instance, 'attr': name,})
-        return self.storage.get(self.attributes[name].slug, None)
+        return self.get_stored(self.attributes[name].slug)
 
     def __setattr__(self, name, value):
         if name.startswith('_') or not name in self.attributes:
@@ -112,31 +200,159 @@ class Entity(object):
 
     def __iter__(self):
         for attribute in self.attributes.values():
-            yield (attribute.slug, self.storage.get(attribute.slug, None),)
+            yield (attribute.slug, self.get_stored(attribute.slug),)
 
     @property
     def attributes(self):
         if not hasattr(self, '__attributes__'):
-            self.__attributes__ = OrderedDict(
-                (i.slug, i,) for i in self.get_all_attributes())
+            self.__attributes__ = Schema.intern(self.get_all_attributes())
         return self.__attributes__
 
     @property
     def storage(self):
         if not hasattr(self, '__storage__'):
-            data = getattr(self.instance,
-                           self.instance._eav_config.eav_field, None)
-            self.__storage__ = self.deserialize(data)
+            cache = self.get_value_cache()
+            data = self.get_data()
+            key = cache and self.get_cache_key(data)
+            storage = key and cache.get_many([key]).get(key, None)
+            if storage is None:
+                storage = self.deserialize(data)
+                key and cache.set_many({key: (storage, len(data),),})
+            self.__storage__ = storage
         return self.__storage__
 
+    def get_value_cache(self):
+        return get_value_cache()
+
+    def get_data(self):
+        """
+        Get raw eav data (text or bytes for binary field, never memoryview
+        or buffer). If eav field is deferred and instance is fetched by
+        EavQuerySet, data is loaded for all instances of queryset at once.
+        """
+        eav_field = self.instance._eav_config.eav_field
+        siblings = getattr(self, '__siblings__', None)
+        if siblings and not eav_field in self.instance.__dict__:
+            self.load_deferred(siblings)
+        return normalize_blob(getattr(self.instance, eav_field, None))
+
+    @staticmethod
+    def link_siblings(instances):
+        """
+        Link instances with deferred eav field to each other, so data of all
+        of them is loaded by one query on first access to any of them.
+        """
+        instances = [i for i in instances if hasattr(i, '_eav_config')]
+        if len(instances) < 2:
+            return
+        config = instances[0]._eav_config
+        if config.eav_field in instances[0].__dict__:
+            return  # not deferred
+        for instance in instances:
+            getattr(instance, config.eav_attr).__siblings__ = instances
+
+    @classmethod
+    def load_deferred(cls, instances):
+        """Load deferred eav data of instances with one query per batch."""
+        config = instances[0]._eav_config
+        deferred = [i for i in instances
+                    if not config.eav_field in i.__dict__ and i.pk is not None]
+        for start in range(0, len(deferred), cls.deferred_batch_size):
+            batch = deferred[start:start + cls.deferred_batch_size]
+            model_cls = batch[0]._meta.concrete_model
+            data = dict(
+                model_cls._base_manager.using(batch[0]._state.db)
+                .filter(pk__in=[i.pk for i in batch])
+                .values_list('pk', config.eav_field))
+            for instance in batch:
+                if instance.pk in data:
+                    setattr(instance, config.eav_field, data[instance.pk])
+        for instance in instances:
+            getattr(instance, config.eav_attr).__siblings__ = None
+
+    def get_cache_key(self, data=None):
+        """
+        Get decoded values cache key by model, pk, schema signature and hash of
+        raw eav data, or None if there is nothing to cache.
+        """
+        if data is None:
+            data = self.get_data()
+        if not data or self.instance.pk is None:
+            return None
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        return 'eavkit:values:%s.%s:%s:%s:%s' % (
+            self.instance._meta.app_label, self.instance._meta.model_name,
+            self.instance.pk, self.attributes.signature,
+            hashlib.md5(data).hexdigest(),)
+
+    @classmethod
+    def prefetch_values(cls, instances, decode_missing=True):
+        """
+        Load decoded values of all passed instances from values cache with
+        one cache round-trip, decode and cache missing ones (or leave them
+        for lazy partial decoding, if decode_missing is False).
+        """
+        cache = get_value_cache()
+        if cache is None:
+            return
+
+        entities = {}
+        for instance in instances:
+            entity = getattr(instance, instance._eav_config.eav_attr)
+            key = (not hasattr(entity, '__storage__') and
+                   entity.get_cache_key())
+            if key:
+                entities[key] = entity
+        if not entities:
+            return
+
+        found, missing = cache.get_many(list(entities.keys())), {}
+        for key, entity in entities.items():
+            storage = found.get(key, None)
+            if storage is None:
+                if not decode_missing:
+                    continue
+                data = entity.get_data()
+                storage = entity.deserialize(data)
+                missing[key] = (storage, len(data),)
+            entity.__storage__ = storage
+        missing and cache.set_many(missing)
+
+    def get_stored(self, name):
+        """Get value from storage, compressed value is decompressed once."""
+        value = self.storage.get(name, None)
+        if isinstance(value, CompressedText):
+            value = self.storage[name] = value.decompress()
+        return value
+
+    def get_value(self, name):
+        """
+        Get decoded value of one attribute. If storage is not loaded yet,
+        decodes only requested attribute value, not all of them.
+        """
+        if hasattr(self, '__storage__'):
+            return self.get_stored(name)
+        if not hasattr(self, '__raw__'):
+            data = self.get_data()
+            self.__raw__ = json.loads(decompress_blob(data)) if data else {}
+        attribute = self.attributes.get(name, None)
+        value = self.__raw__.get(name, None)
+        return (decompressed(attribute.value_decode(value))
+                if not (attribute is None or value is None) else None)
+
     def serialize(self, data):
         for attribute in self.attributes.values():
             value = data.get(attribute.slug, None)
             data[attribute.slug] = attribute.value_encode(value)
-        return json.dumps(data)
+        config = self.instance._eav_config
+        return compress_blob(
+            json.dumps(data), threshold=config.get_compress_threshold(),
+            binary=isinstance(self.instance._meta.get_field(config.eav_field),
+                              models.BinaryField))
 
     def deserialize(self, data):
-        data = json.loads(data) if data else {}
+        data = json.loads(decompress_blob(data)) if data else {}
         for attribute in self.attributes.values():
             value = data.get(attribute.slug, None)
             data[attribute.slug] = attribute.value_decode(
@@ -144,12 +360,16 @@ class Entity(object):
         return data
 
     def get_all_attributes(self):
-        return self.instance._eav_config.get_attributes(
-            instance=self.instance)
+        config = self.instance._eav_config
+        if config.is_schema_cache_enabled():
+            return list(config.get_schema().values())
+        return config.get_attributes(instance=self.instance)
 
     def validate_attributes(self):
         for attribute in self.attributes.values():
             value = self.storage.get(attribute.slug, None)
+            if isinstance(value, CompressedText):
+                continue  # not changed since loading
             if value is None:
                 if attribute.required:
                     raise ValidationError(
@@ -163,14 +383,89 @@ class Entity(object):
                         _(u'%(attr)s EAV field %(err)s')
                         % {'attr': attribute.slug, 'err': e,})
 
-    def save(self):
+    def load(self):
+        """
+        Resolve attributes and decode storage eagerly, so all the I/O is done
+        in one call (e.g. one sync_to_async hop) and later access is free.
+        """
+        self.storage
+        return self
+
+    def dump(self):
         data = copy.deepcopy(self.storage)
         data = self.serialize(data)
 
         eav_field = self.instance._eav_config.eav_field
         self.instance.__setattr__(eav_field, data)
-        self.instance.__class__.objects.filter(pk=self.instance.pk).update(
-            **{eav_field: data,})
+        return data
+
+    def save(self):
+        cache = self.get_value_cache()
+        key = cache and self.get_cache_key()
+        data = self.dump()
+
+        eav_field = self.instance._eav_config.eav_field
+        self.instance.__class__.objects.using(self.instance._state.db).filter(
+            pk=self.instance.pk).update(**{eav_field: data,})
+        key and cache.delete_many([key])
+
+    @classmethod
+    def bulk_save(cls, instances, attributes=None, batch_size=None):
+        """
+        Save eav data of several instances of one model with a single UPDATE
+        query per batch in database of each instance. If attributes is
+        passed, it is shared by all entities with not yet resolved attributes,
+        so schema is resolved only once.
+        """
+        instances = [i for i in instances if i.pk is not None]
+        if not instances:
+            return
+
+        batch_size = batch_size or cls.bulk_batch_size
+        if attributes is not None:
+            cls.attach_attributes(instances, attributes)
+
+        databases = OrderedDict()
+        for instance in instances:
+            databases.setdefault(instance._state.db, []).append(instance)
+
+        cache = get_value_cache()
+        for db, instances in databases.items():
+            cls.bulk_save_batches(instances, db, batch_size, cache)
+
+    @classmethod
+    def bulk_save_batches(cls, instances, db, batch_size, cache=None):
+        model_cls = instances[0].__class__
+        config = model_cls._eav_config
+        field = model_cls._meta.get_field(config.eav_field)
+        with transaction.atomic(using=db):
+            for start in range(0, len(instances), batch_size):
+                batch = instances[start:start + batch_size]
+                keys = cache and [
+                    k for k in (getattr(i, config.eav_attr).get_cache_key()
+                                for i in batch) if k]
+                cases = [
+                    models.When(pk=i.pk, then=models.Value(
+                        getattr(i, config.eav_attr).dump()))
+                    for i in batch
+                ]
+                model_cls.objects.using(db).filter(
+                    pk__in=[i.pk for i in batch]).update(
+                    **{config.eav_field: models.Case(*cases,
+                                                     output_field=field),})
+                keys and cache.delete_many(keys)
+
+    @staticmethod
+    def attach_attributes(instances, attributes):
+        """
+        Set one shared schema to entities of all passed instances, which
+        attributes are not yet resolved.
+        """
+        attributes = Schema.intern(attributes)
+        for instance in instances:
+            entity = getattr(instance, instance._eav_config.eav_attr)
+            if not hasattr(entity, '__attributes__'):
+                entity.__attributes__ = attributes
 
     @staticmethod
     def post_save_handler(sender, *args, **kwargs):
@@ -183,3 +478,26 @@ class Entity(object):
         instance = kwargs['instance']
         entity = getattr(instance, instance._eav_config.eav_attr)
         entity.validate_attributes()
+
+
+class EavQuerySetMixin(object):
+    """
+    QuerySet mixin, which links fetched instances to each other, so deferred
+    eav data (e.g. with .defer('eavdata')) is loaded for all instances of
+    queryset with one query, when it is accessed on any of them.
+    """
+    def _fetch_all(self):
+        fetched = self._result_cache is None
+        super(EavQuerySetMixin, self)._fetch_all()
+        if fetched and self._result_cache and hasattr(self.model,
+                                                      '_eav_config'):
+            self.model._eav_config.entity_cls.link_siblings(
+                self._result_cache)
+
+
+class EavQuerySet(EavQuerySetMixin, models.QuerySet):
+    pass
+
+
+class EavManager(models.Manager.from_queryset(EavQuerySet)):
+    pass
@@ -1,10 +1,21 @@
 # coding: utf-8
+import os
+import time
+import uuid
+import logging
 from collections import OrderedDict
-from django.db.models.signals import post_init, pre_save, post_save
-from .models import Entity, BaseAttributeOptions
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, router, transaction
+from django.db.models.signals import (post_init, pre_save, post_save,
+                                      post_delete)
+from .models import Entity, BaseAttributeOptions, Schema
 from . import attributes
 
 
+logger = logging.getLogger('eavkit')
+
+
 class EavConfig(object):
     """
     The default EevConfig class used if it is not overriden on registration.
@@ -15,9 +26,24 @@ class EavConfig(object):
     model_cls = None
     entity_cls = None
 
+    # database alias for schema reads (e.g. read replica), None means
+    # EAVKIT_SCHEMA_DATABASE setting value or database routers choice
+    schema_database = None
+
+    # eav data blobs not shorter than threshold (in chars) are compressed,
+    # None means EAVKIT_COMPRESS_THRESHOLD setting value (disabled)
+    compress_threshold = None
+
+    # schema (attributes resolved without instance) in-process caching,
+    # None means EAVKIT_SCHEMA_CACHE setting value (False by default);
+    # enable only if get_attributes result does not depend on instance
+    schema_cache = None
+    schema_cache_timeout = 60  # seconds between schema version checks
+
     def __init__(self, model_cls, entity_cls):
         self.model_cls = model_cls
         self.entity_cls = entity_cls
+        self._schema = None
 
     def get_attr_model(self):
         return registry.attr_model
@@ -27,38 +53,105 @@ class EavConfig(object):
         By default, all eavkit.models.BaseAttributeOptions object apply to an
         entity, unless you provide a custom EavConfig class overriding this.
         """
-        return [i.get_attribute() for i in self.get_attr_model().objects.all()]
+        return [i.get_attribute() for i in
+                self.get_attr_queryset(database=kwargs.get('database', None))]
+
+    def get_schema_database(self):
+        return self.schema_database or getattr(
+            settings, 'EAVKIT_SCHEMA_DATABASE', None)
+
+    def get_compress_threshold(self):
+        return (self.compress_threshold
+                if self.compress_threshold is not None else
+                getattr(settings, 'EAVKIT_COMPRESS_THRESHOLD', None))
+
+    def get_attr_queryset(self, database=None):
+        queryset = self.get_attr_model().objects.all()
+        database = database or self.get_schema_database()
+        return queryset.using(database) if database else queryset
+
+    def is_schema_cache_enabled(self):
+        return (self.schema_cache if self.schema_cache is not None else
+                getattr(settings, 'EAVKIT_SCHEMA_CACHE', False))
+
+    def get_schema(self):
+        """
+        Get compiled schema of attributes resolved without instance. If schema
+        cache is enabled, schema is cached in process memory and validated by
+        shared schema version at most once in schema_cache_timeout seconds
+        and always in a new process (e.g. forked worker with inherited cache).
+        Without version (e.g. dummy cache backend) schema is never reused.
+        After version change schema is read from the write database, so
+        schema database replica lag does not leave stale schema cached.
+        """
+        if not self.is_schema_cache_enabled():
+            return Schema.intern(self.get_attributes()).compile()
+
+        now, pid = time.time(), os.getpid()
+        cached = self._schema  # (schema, version, checked, pid)
+        if (cached and cached[1] is not None and cached[3] == pid and
+                now - cached[2] < self.schema_cache_timeout):
+            return cached[0]
+
+        version = registry.get_schema_version()
+        if cached and version is not None and cached[1] == version:
+            schema = cached[0]
+        elif cached and version is not None and cached[1] is not None:
+            database = router.db_for_write(self.get_attr_model())
+            schema = Schema.intern(
+                self.get_attributes(database=database)).compile()
+        else:
+            schema = Schema.intern(self.get_attributes()).compile()
+        self._schema = (schema, version, now, pid,)
+        return schema
+
+    def warmup(self):
+        """Resolve and compile cached schema, if schema cache is enabled."""
+        return self.get_schema() if self.is_schema_cache_enabled() else None
 
 
 class Registry(object):
     attributes = None
     attr_model = None
     entity_cls = None
+    models = None
+
+    schema_version_key = 'eavkit:schema_version'
 
     def __init__(self):
         self.attributes = OrderedDict()
         self.entity_cls = Entity
+        self.models = []
 
-    def register_attribute(self, attribute):
+    def register_attribute(self, attribute, update_choices=True):
         self.attributes[attribute.datatype] = attribute
-        self.set_datatype_choices()
+        update_choices and self.set_datatype_choices()
 
-    def unregister_attribute(self, attribute):
+    def unregister_attribute(self, attribute, update_choices=True):
         self.attributes.pop(attribute.datatype)
-        self.set_datatype_choices()
+        update_choices and self.set_datatype_choices()
 
     def register_builtin_attributes(self):
-        self.register_attribute(attributes.StringAttribute)
-        self.register_attribute(attributes.TextAttribute)
-        self.register_attribute(attributes.IntegerAttribute)
-        self.register_attribute(attributes.FloatAttribute)
-        self.register_attribute(attributes.BooleanAttribute)
-        self.register_attribute(attributes.DateAttribute)
-        self.register_attribute(attributes.DateTimeAttribute)
+        for attribute in (attributes.StringAttribute,
+                          attributes.TextAttribute,
+                          attributes.IntegerAttribute,
+                          attributes.FloatAttribute,
+                          attributes.BooleanAttribute,
+                          attributes.DateAttribute,
+                          attributes.DateTimeAttribute,):
+            self.register_attribute(attribute, update_choices=False)
+        self.set_datatype_choices()
 
     def register_model(self, attr_model, force=False):
         if issubclass(attr_model, BaseAttributeOptions) or force:
+            if self.attr_model:
+                post_save.disconnect(self.bump_schema_version,
+                                     sender=self.attr_model)
+                post_delete.disconnect(self.bump_schema_version,
+                                       sender=self.attr_model)
             self.attr_model = attr_model
+            post_save.connect(self.bump_schema_version, sender=attr_model)
+            post_delete.connect(self.bump_schema_version, sender=attr_model)
             self.set_datatype_choices()
 
     def register_entity(self, entity_cls, force=False):
@@ -79,6 +172,7 @@ class Registry(object):
                 config_cls(model_cls, entity_cls or self.entity_cls))
 
         self.attach_signals(model_cls)
+        self.models.append(model_cls)
 
     def unregister(self, model_cls):
         """Unregisters model_cls with eav."""
@@ -86,6 +180,7 @@ class Registry(object):
             return
         self.detach_signals(model_cls)
         delattr(model_cls, '_eav_config')
+        self.models.remove(model_cls)
 
     def attach_signals(self, model_cls):
         """Attach all signals for eav"""
@@ -114,4 +209,53 @@ class Registry(object):
                        for k, v in self.attributes.items()])
             )
 
+    def get_schema_cache(self):
+        return caches[getattr(settings, 'EAVKIT_SCHEMA_CACHE_ALIAS',
+                              'default')]
+
+    def get_schema_version(self):
+        """Get schema version, shared by all processes via django cache."""
+        cache = self.get_schema_cache()
+        version = cache.get(self.schema_version_key)
+        if version is None:
+            cache.add(self.schema_version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.schema_version_key)
+        return version
+
+    def bump_schema_version(self, *args, **kwargs):
+        """
+        Change schema version after commit of current transaction of "using"
+        database (signal kwarg), so other processes do not cache schema read
+        before the change is visible (immediately on django 1.8).
+        """
+        on_commit = getattr(transaction, 'on_commit', None)
+        if on_commit is None:
+            self.set_schema_version()
+        else:
+            on_commit(self.set_schema_version, using=kwargs.get('using', None))
+
+    def set_schema_version(self):
+        self.get_schema_cache().set(self.schema_version_key,
+                                    uuid.uuid4().hex, None)
+
+    def warmup(self):
+        """
+        Resolve and compile cached schemas of all registered models once,
+        e.g. in master process before workers fork (gunicorn --preload).
+        """
+        started, schemas, count = time.time(), 0, 0
+        for model_cls in self.models:
+            try:
+                schema = model_cls._eav_config.warmup()
+            except DatabaseError as e:
+                logger.warning('eavkit: %s schema warm-up failed: %s',
+                               model_cls.__name__, e)
+                continue
+            if schema is not None:
+                schemas, count = schemas + 1, count + len(schema)
+
+        logger.info('eavkit: %d schemas (%d attributes) warmed up in %.1f ms',
+                    schemas, count, (time.time() - started) * 1000)
+        return schemas
+
 registry = Registry()
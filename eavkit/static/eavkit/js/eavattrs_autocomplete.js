@@ -0,0 +1,70 @@
+(function ($) {
+    // autocomplete for select.eavattrs-autocomplete, which contains selected
+    // options only, other options are loaded from data-autocomplete-url
+    var init = function(select) {
+        select = $(select);
+        if (select.data('eavattrs-autocomplete')) return;
+        if ((select.attr('name') || '').indexOf('__prefix__') != -1) return;
+        select.data('eavattrs-autocomplete', true);
+
+        var search = $('<input type="text" class="vTextField" placeholder="Search...">');
+        var results = $('<ul class="eavattrs-autocomplete-results"></ul>');
+        var timer = null, query = '', page = 1;
+
+        results.css({'list-style': 'none', 'margin': '0', 'padding': '0',
+                     'max-height': '200px', 'overflow-y': 'auto'});
+        select.before(search).after(results);
+
+        var load = function(append) {
+            $.getJSON(select.data('autocomplete-url'), {q: query, page: page}, function(data) {
+                if (!append) results.empty();
+                results.find('li.more').remove();
+                $.each(data.results, function(i, item) {
+                    results.append($('<li><a href="#"></a></li>').find('a')
+                        .text(item.text).data('item', item).end());
+                });
+                if (data.pagination.more) {
+                    results.append('<li class="more"><a href="#">More...</a></li>');
+                }
+            });
+        };
+
+        search.on('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(function() {
+                query = search.val();
+                page = 1;
+                query ? load(false) : results.empty();
+            }, 250);
+        });
+
+        results.on('click', 'a', function() {
+            var li = $(this).parent();
+            if (li.hasClass('more')) {
+                page += 1;
+                load(true);
+                return false;
+            }
+            var item = $(this).data('item');
+            if (!select.attr('multiple')) {
+                select.find('option[value!=""]').remove();
+            }
+            if (!select.find('option').filter(function() {
+                    return this.value == item.id; }).length) {
+                select.append($('<option></option>').val(item.id).text(item.text));
+            }
+            select.find('option').filter(function() {
+                return this.value == item.id; }).prop('selected', true);
+            select.trigger('change');
+            return false;
+        });
+    };
+
+    $(function() {
+        $('select.eavattrs-autocomplete').each(function() { init(this); });
+        $(document).on('formset:added', function(event, row) {
+            $(row).find('select.eavattrs-autocomplete').each(function() { init(this); });
+        });
+    });
+
+})(django.jQuery);
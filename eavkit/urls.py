@@ -0,0 +1,8 @@
+from django.conf.urls import url
+from . import views
+
+
+urlpatterns = [
+    url(r'^choices/(?P<slug>[a-z][a-z0-9_]*)/$', views.choices_autocomplete,
+        name='eavkit_choices_autocomplete'),
+]
@@ -0,0 +1,60 @@
+# coding: utf-8
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, JsonResponse
+from django.utils.encoding import force_text
+from .registry import registry
+
+
+# slug: (schema version, attribute) of attributes with compiled choices index
+choices_attributes = {}
+
+
+def get_choices_attribute(slug):
+    """
+    Get attribute with choices by slug, cached with its compiled choices
+    index until schema version change, so schema and index are not resolved
+    on each request, even if schema cache is disabled.
+    """
+    version = registry.get_schema_version()
+    cached = choices_attributes.get(slug, None)
+    if version is not None and cached and cached[0] == version:
+        return cached[1]
+
+    attribute = find_choices_attribute(slug)
+    if attribute is not None:
+        attribute.get_choices_index()
+        choices_attributes[slug] = (version, attribute,)
+    else:
+        choices_attributes.pop(slug, None)
+    return attribute
+
+
+def find_choices_attribute(slug):
+    for model_cls in registry.models:
+        attribute = model_cls._eav_config.get_schema().get(slug, None)
+        if attribute is not None and attribute.choices and hasattr(
+                attribute, 'search_choices'):
+            return attribute
+    return None
+
+
+@staff_member_required
+def choices_autocomplete(request, slug):
+    """
+    Choices of attribute, found by title prefix ("q" parameter) and paginated
+    ("page" parameter), in select2 compatible json format.
+    """
+    attribute = get_choices_attribute(slug)
+    if attribute is None:
+        raise Http404('Attribute with choices "%s" not found.' % slug)
+
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    results, more = attribute.search_choices(request.GET.get('q', u''), page)
+    return JsonResponse({
+        'results': [{'id': force_text(value), 'text': force_text(title),}
+                    for value, title in results],
+        'pagination': {'more': more,},
+    })